@@ -0,0 +1,119 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from django.db import InterfaceError, OperationalError, close_old_connections, connections
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Seconds the writer waits after the first queued event so later ones share its INSERT
+FLUSH_INTERVAL = 0.5
+
+# Maximum audit events written per INSERT (keeps us under Postgres parameter limits)
+BATCH_SIZE = 1000
+
+# Longest wait, in seconds, between retries while the database is unreachable
+MAX_RETRY_DELAY = 30
+
+# Errors meaning the database couldn't be reached; the batch is kept and retried
+_TRANSIENT_ERRORS = (InterfaceError, OperationalError)
+
+_queue = deque()
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+def write_batch(batch: list, batch_size: int = BATCH_SIZE, raise_errors: bool = False) -> int:
+    """
+    Bulk insert unsaved audit log entries
+    
+    Returns the number of entries written. Errors are logged and swallowed
+    unless raise_errors is set.
+    """
+    try:
+        AuditLog.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=False)
+        return len(batch)
+    except Exception as e:
+        logger.error(f"Error flushing {len(batch)} audit events: {str(e)}")
+        if raise_errors:
+            raise
+        return 0
+
+def enqueue(audit_log: AuditLog) -> None:
+    """
+    Queue an unsaved audit log entry for a background bulk insert
+    
+    Entries are written by a long-lived writer thread within FLUSH_INTERVAL
+    seconds, so request threads never wait on the audit INSERT.
+    """
+    _queue.append(audit_log)
+    _ensure_worker()
+    _wakeup.set()
+
+def flush(raise_errors: bool = False) -> int:
+    """
+    Write all queued audit events in batches
+    
+    Returns the number of events written. If the database can't be reached
+    the failed batch goes back on the front of the queue, and the error is
+    raised when raise_errors is set. A batch rejected for other reasons is
+    retried one event at a time so only the offending events are dropped.
+    """
+    written = 0
+    while True:
+        batch = []
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.popleft())
+            except IndexError:  # drained, possibly by another thread
+                break
+        if not batch:
+            return written
+        
+        try:
+            written += write_batch(batch, raise_errors=True)
+        except _TRANSIENT_ERRORS:
+            # Keep the events, in order, for the next attempt
+            _queue.extendleft(reversed(batch))
+            if raise_errors:
+                raise
+            return written
+        except Exception:
+            written += sum(write_batch([audit_log]) for audit_log in batch)
+
+def _ensure_worker() -> None:
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        # Also restarts the writer in a forked child, where it isn't running
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='metadata-audit-writer', daemon=True)
+            _worker.start()
+
+def _run_worker() -> None:
+    # One thread for the life of the process, so its database connection is
+    # reused across flushes instead of reopened for each one
+    retry_delay = FLUSH_INTERVAL
+    while True:
+        _wakeup.wait()
+        time.sleep(FLUSH_INTERVAL)
+        _wakeup.clear()
+        
+        # Like a request thread, drop a connection past CONN_MAX_AGE or one
+        # the server closed while the writer was idle
+        close_old_connections()
+        try:
+            flush(raise_errors=True)
+            retry_delay = FLUSH_INTERVAL
+        except Exception:
+            # The batch is back on the queue; reconnect and retry with backoff
+            connections.close_all()
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+            _wakeup.set()
+
+# Write anything still queued when the process shuts down
+atexit.register(flush)
@@ -0,0 +1,66 @@
+import functools
+import logging
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler, set_rollback
+from .models import MetadataRecord
+
+logger = logging.getLogger(__name__)
+
+def custom_exception_handler(exc, context):
+    """
+    Turn exceptions raised by the API views into error responses
+    
+    Applied to the API views by handle_api_errors, and can also be registered
+    as REST_FRAMEWORK['EXCEPTION_HANDLER']. Missing objects become
+    404s and Django validation errors 400s; DRF's own exceptions go through
+    DRF's handler, and anything else is logged and returned as a 500.
+    """
+    if isinstance(exc, MetadataRecord.DoesNotExist):
+        return Response({
+            'error': 'Metadata not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if isinstance(exc, ObjectDoesNotExist):
+        return Response({
+            'error': 'Not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if isinstance(exc, ValidationError):
+        return Response({
+            'error': 'Invalid request',
+            'details': exc.messages
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    response = exception_handler(exc, context)
+    if response is not None:
+        return response
+    
+    view_name = context.get('view_name') or type(context.get('view')).__name__
+    logger.error(f"Error in {view_name}: {str(exc)}")
+    set_rollback()
+    return Response({
+        'error': 'Internal server error',
+        'details': str(exc)
+    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def handle_api_errors(view_func):
+    """
+    Route exceptions from a view's body through custom_exception_handler
+    
+    Keeps the views' JSON error responses independent of whether the
+    project registers the handler in its REST_FRAMEWORK settings.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except Exception as exc:
+            return custom_exception_handler(exc, {
+                'request': request,
+                'args': args,
+                'kwargs': kwargs,
+                'view_name': view_func.__name__
+            })
+    return wrapper
@@ -0,0 +1,17 @@
+from .utils import get_client_ip
+
+class ClientIPMiddleware:
+    """
+    Resolve the client IP once per request as ``request.client_ip``
+    
+    Optional: with 'metadata.middleware.ClientIPMiddleware' in MIDDLEWARE
+    the API views reuse this address instead of re-parsing the proxy
+    headers; without it they parse the headers themselves.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request.client_ip = get_client_ip(request)
+        return self.get_response(request)
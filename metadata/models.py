@@ -1,7 +1,61 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 from django.utils import timezone
 import json
+from functools import cached_property
+
+class MetadataRecordQuerySet(models.QuerySet):
+    """QuerySet helpers for MetadataRecord"""
+    
+    def list_fields(self):
+        """Load only the lightweight columns shown in list views"""
+        return self.only(*self.model.LIST_FIELDS)
+    
+    def insert_if_absent(self, record) -> bool:
+        """
+        Insert a record unless one with the same content_hash already exists
+        
+        Sets record.pk to the stored row's id either way and returns whether
+        a row was inserted. On PostgreSQL and SQLite this is a single
+        INSERT ... ON CONFLICT DO NOTHING RETURNING round trip.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        meta = self.model._meta
+        
+        if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+            fields = [field for field in meta.concrete_fields if not field.primary_key]
+            values = [field.get_db_prep_save(field.pre_save(record, True), connection) for field in fields]
+            qn = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {qn(meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) "
+                    f"VALUES ({', '.join(['%s'] * len(fields))}) "
+                    f"ON CONFLICT ({qn(meta.get_field('content_hash').column)}) DO NOTHING "
+                    f"RETURNING {qn(meta.pk.column)}",
+                    values
+                )
+                row = cursor.fetchone()
+            created = row is not None
+            if created:
+                record.pk = row[0]
+        else:
+            try:
+                with transaction.atomic(using=db):
+                    record.save(force_insert=True, using=db)
+                created = True
+            except IntegrityError:
+                if not self.using(db).filter(content_hash=record.content_hash).exists():
+                    raise
+                created = False
+        
+        if not created:
+            record.pk = self.using(db).values_list('id', flat=True).get(content_hash=record.content_hash)
+        record._state.adding = False
+        record._state.db = db
+        return created
 
 class MetadataRecord(models.Model):
     """Core metadata record for compliance purposes"""
@@ -15,6 +69,9 @@ class MetadataRecord(models.Model):
         ('interaction', 'Interaction'),
     ]
     
+    # Columns needed by list views; skips the metadata_json and user_agent blobs
+    LIST_FIELDS = ['id', 'content_hash', 'content_type', 'timestamp', 'user_address']
+    
     content_hash = models.CharField(max_length=64, unique=True, help_text="SHA256 hash of content")
     content_type = models.CharField(max_length=50, choices=CONTENT_TYPES, help_text="Type of content")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When metadata was recorded")
@@ -25,18 +82,38 @@ class MetadataRecord(models.Model):
     is_encrypted = models.BooleanField(default=False, help_text="Whether metadata is encrypted")
     encryption_key_id = models.CharField(max_length=100, blank=True, null=True, help_text="ID of encryption key used")
     
+    objects = MetadataRecordQuerySet.as_manager()
+    
     class Meta:
         db_table = 'metadata_records'
         indexes = [
             models.Index(fields=['content_hash']),
-            models.Index(fields=['user_address']),
             models.Index(fields=['timestamp']),
-            models.Index(fields=['content_type']),
+            # Serves content_type equality on its own (left prefix) and the
+            # content_type + timestamp range used by retention cleanup
+            models.Index(fields=['content_type', 'timestamp'], name='md_ct_ts_idx'),
+            # Filtered keyset pagination in list views
+            models.Index(fields=['content_type', 'id'], name='md_ct_id_idx'),
+            # Also serves user_address equality on its own (left prefix)
+            models.Index(fields=['user_address', 'id'], name='md_user_id_idx'),
+            GinIndex(fields=['metadata_json'], name='md_metajson_gin'),
+            # Substring (icontains) search on addresses; needs the pg_trgm extension
+            # and django.contrib.postgres (for OpClass). icontains compiles to
+            # UPPER(user_address) LIKE UPPER(...), so the index is on that
+            # expression rather than the bare column
+            GinIndex(OpClass(Upper('user_address'), name='gin_trgm_ops'), name='md_user_addr_trgm'),
         ]
-        ordering = ['-timestamp']
+    
+    @cached_property
+    def short_hash(self):
+        return self.content_hash[:8]
+    
+    @cached_property
+    def short_user(self):
+        return self.user_address[:8]
     
     def __str__(self):
-        return f"{self.content_type}:{self.content_hash[:8]}... ({self.user_address[:8]}...)"
+        return f"{self.content_type}:{self.short_hash}... ({self.short_user}...)"
 
 class AuditLog(models.Model):
     """Audit trail for compliance and policy enforcement"""
@@ -68,11 +145,15 @@ class AuditLog(models.Model):
             models.Index(fields=['user_address']),
             models.Index(fields=['action']),
             models.Index(fields=['is_compliant']),
+            GinIndex(fields=['details'], name='audit_details_gin'),
         ]
-        ordering = ['-timestamp']
+    
+    @cached_property
+    def short_user(self):
+        return self.user_address[:8]
     
     def __str__(self):
-        return f"{self.action} by {self.user_address[:8]}... at {self.timestamp}"
+        return f"{self.action} by {self.short_user}... at {self.timestamp}"
 
 class CompliancePolicy(models.Model):
     """Policies for compliance enforcement"""
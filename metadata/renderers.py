@@ -0,0 +1,57 @@
+import orjson
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+# datetimes are written natively by orjson; UTC ones end in "Z" like DRF's
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+# DRF's encoder covers the types orjson doesn't (Decimal, lazy strings, ...)
+_fallback_encoder = JSONEncoder()
+
+def orjson_default(obj):
+    """Serialize types orjson doesn't handle natively"""
+    return _fallback_encoder.default(obj)
+
+def orjson_dumps(data) -> bytes:
+    """Serialize data to JSON bytes the way the API renders it"""
+    return orjson.dumps(data, default=orjson_default, option=ORJSON_OPTIONS)
+
+class ORJSONRenderer(renderers.BaseRenderer):
+    """
+    JSON renderer backed by orjson
+    
+    Drop-in replacement for rest_framework.renderers.JSONRenderer; register
+    it under REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] to use it for every
+    endpoint.
+    """
+    
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson_dumps(data)
+
+class ORJSONParser(parsers.BaseParser):
+    """
+    JSON parser backed by orjson
+    
+    Drop-in replacement for rest_framework.parsers.JSONParser; register it
+    under REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].
+    """
+    
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f"JSON parse error - {str(e)}")
+
+# Renderer/parser lists for views, matching DRF's defaults with orjson swapped in
+API_RENDERER_CLASSES = [ORJSONRenderer, renderers.BrowsableAPIRenderer]
+API_PARSER_CLASSES = [ORJSONParser, parsers.FormParser, parsers.MultiPartParser]
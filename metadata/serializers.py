@@ -1,9 +1,99 @@
+import copy
+import re
+from functools import cached_property
 from rest_framework import serializers
 from .models import MetadataRecord, AuditLog, CompliancePolicy, DataRetentionRule, ComplianceReport
+from .utils import WALLET_ADDRESS_LENGTHS, hash_content, validate_metadata as validate_metadata_schema
 
-class MetadataRecordSerializer(serializers.ModelSerializer):
+# First two octets of a dotted IPv4 address
+_V4_RE = re.compile(r'^(\d+\.\d+)\.\d+\.\d+$')
+_V6_MARKER = ':'
+
+def _unmasked(data):
+    return data
+
+def mask_ip(ip_address):
+    """Mask IP address for privacy"""
+    if not ip_address:
+        return ip_address
+    
+    match = _V4_RE.match(ip_address)
+    if match:  # IPv4
+        return match.group(1) + '.*.*'
+    if _V6_MARKER in ip_address:  # IPv6
+        return ip_address[:8] + '...'
+    
+    return ip_address
+
+def mask_sensitive(data):
+    """Mask user and IP addresses in a serialized record for non-admin users"""
+    data['user_address'] = f"{data['user_address'][:8]}..."
+    if 'ip_address' in data:
+        data['ip_address'] = mask_ip(data['ip_address'])
+    return data
+
+class CachedFieldsMixin:
+    """
+    Build ModelSerializer fields once per class instead of once per instance
+    
+    Field introspection is the expensive part of instantiating a
+    ModelSerializer; each instance gets shallow copies of the cached fields.
+    """
+    
+    _fields_cache = {}
+    
+    def get_fields(self):
+        cls = self.__class__
+        fields = CachedFieldsMixin._fields_cache.get(cls)
+        if fields is None:
+            fields = super().get_fields()
+            CachedFieldsMixin._fields_cache[cls] = fields
+        return {name: copy.copy(field) for name, field in fields.items()}
+
+class FastChoiceField(serializers.ChoiceField):
+    """ChoiceField that validates input with a single set membership check"""
+    
+    def __init__(self, choices, **kwargs):
+        super().__init__(choices, **kwargs)
+        self._keys = frozenset(self.choices)
+    
+    def to_internal_value(self, data):
+        if data == '' and self.allow_blank:
+            return ''
+        
+        try:
+            if data in self._keys:
+                return data
+        except TypeError:  # unhashable input
+            pass
+        
+        self.fail('invalid_choice', input=data)
+
+class IPMaskingMixin:
+    """
+    Shared masking for serializers that expose user and client addresses
+    
+    Whether to mask is decided once per serializer from the context, so
+    rendering each row is a single call with no context lookup.
+    """
+    
+    @cached_property
+    def _mask(self):
+        """Masking step for this serializer's context"""
+        if self.context.get('is_admin', False):
+            return _unmasked
+        return mask_sensitive
+    
+    def to_representation(self, instance):
+        """Custom representation for sensitive data"""
+        return self._mask(super().to_representation(instance))
+
+    
+class MetadataRecordSerializer(IPMaskingMixin, CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for MetadataRecord model"""
     
+    serializer_choice_field = FastChoiceField
+    
     class Meta:
         model = MetadataRecord
         fields = [
@@ -12,34 +102,19 @@ class MetadataRecordSerializer(serializers.ModelSerializer):
             'encryption_key_id'
         ]
         read_only_fields = ['id', 'timestamp', 'ip_address', 'user_agent']
+
+class MetadataRecordListSerializer(MetadataRecordSerializer):
+    """Lightweight MetadataRecord serializer for list views"""
     
-    def to_representation(self, instance):
-        """Custom representation for sensitive data"""
-        data = super().to_representation(instance)
-        
-        # Mask sensitive information for non-admin users
-        if not self.context.get('is_admin', False):
-            data['user_address'] = f"{data['user_address'][:8]}..."
-            data['ip_address'] = self._mask_ip(data['ip_address'])
-        
-        return data
-    
-    def _mask_ip(self, ip_address):
-        """Mask IP address for privacy"""
-        if not ip_address:
-            return ip_address
-        
-        parts = ip_address.split('.')
-        if len(parts) == 4:  # IPv4
-            return f"{parts[0]}.{parts[1]}.*.*"
-        elif ':' in ip_address:  # IPv6
-            return f"{ip_address[:8]}..."
-        
-        return ip_address
+    class Meta(MetadataRecordSerializer.Meta):
+        fields = MetadataRecord.LIST_FIELDS
+        read_only_fields = ['id', 'timestamp']
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(IPMaskingMixin, CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for AuditLog model"""
     
+    serializer_choice_field = FastChoiceField
+    
     class Meta:
         model = AuditLog
         fields = [
@@ -47,34 +122,12 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'details', 'authorized_by', 'is_compliant', 'policy_reference'
         ]
         read_only_fields = ['id', 'timestamp']
-    
-    def to_representation(self, instance):
-        """Custom representation for audit logs"""
-        data = super().to_representation(instance)
-        
-        # Mask sensitive information for non-admin users
-        if not self.context.get('is_admin', False):
-            data['user_address'] = f"{data['user_address'][:8]}..."
-            data['ip_address'] = self._mask_ip(data['ip_address'])
-        
-        return data
-    
-    def _mask_ip(self, ip_address):
-        """Mask IP address for privacy"""
-        if not ip_address:
-            return ip_address
-        
-        parts = ip_address.split('.')
-        if len(parts) == 4:  # IPv4
-            return f"{parts[0]}.{parts[1]}.*.*"
-        elif ':' in ip_address:  # IPv6
-            return f"{ip_address[:8]}..."
-        
-        return ip_address
 
-class CompliancePolicySerializer(serializers.ModelSerializer):
+class CompliancePolicySerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for CompliancePolicy model"""
     
+    serializer_choice_field = FastChoiceField
+    
     class Meta:
         model = CompliancePolicy
         fields = [
@@ -83,9 +136,11 @@ class CompliancePolicySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class DataRetentionRuleSerializer(serializers.ModelSerializer):
+class DataRetentionRuleSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for DataRetentionRule model"""
     
+    serializer_choice_field = FastChoiceField
+    
     class Meta:
         model = DataRetentionRule
         fields = [
@@ -94,9 +149,11 @@ class DataRetentionRuleSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
-class ComplianceReportSerializer(serializers.ModelSerializer):
+class ComplianceReportSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer for ComplianceReport model"""
     
+    serializer_choice_field = FastChoiceField
+    
     class Meta:
         model = ComplianceReport
         fields = [
@@ -106,22 +163,31 @@ class ComplianceReportSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'generated_at']
 
 class MetadataCreateSerializer(serializers.Serializer):
-    """Serializer for creating metadata records"""
+    """
+    Serializer for creating metadata records
+    
+    save() takes the request's ip_address and user_agent and stores the
+    MetadataRecord. Stores are idempotent: resubmitting content that is
+    already stored returns the existing record instead of failing, with
+    ``created`` set to False.
+    """
+    
+    created = False
     
     user_address = serializers.CharField(max_length=44, help_text="Wallet address of user")
-    content_type = serializers.ChoiceField(choices=MetadataRecord.CONTENT_TYPES, help_text="Type of content")
-    content = serializers.CharField(help_text="Content to hash and store")
+    content_type = FastChoiceField(choices=MetadataRecord.CONTENT_TYPES, help_text="Type of content")
+    content = serializers.JSONField(help_text="Content to hash and store (text or JSON)")
     metadata = serializers.JSONField(required=False, default=dict, help_text="Additional metadata")
     
     def validate_user_address(self, value):
         """Validate wallet address format"""
-        if not value or len(value) < 26 or len(value) > 44:
+        if not value or len(value) not in WALLET_ADDRESS_LENGTHS:
             raise serializers.ValidationError("Invalid wallet address format")
         return value
     
     def validate_content(self, value):
         """Validate content is not empty"""
-        if not value or len(value.strip()) == 0:
+        if not value or (isinstance(value, str) and len(value.strip()) == 0):
             raise serializers.ValidationError("Content cannot be empty")
         return value
     
@@ -130,6 +196,25 @@ class MetadataCreateSerializer(serializers.Serializer):
         if not isinstance(value, dict):
             raise serializers.ValidationError("Metadata must be a JSON object")
         return value
+    
+    def validate(self, data):
+        """Validate metadata has the fields required for its content type"""
+        if not validate_metadata_schema(data['content_type'], data['metadata']):
+            raise serializers.ValidationError({'metadata': "Invalid metadata format"})
+        return data
+    
+    def create(self, validated_data):
+        record = MetadataRecord(
+            content_hash=hash_content(validated_data['content']),
+            content_type=validated_data['content_type'],
+            user_address=validated_data['user_address'],
+            ip_address=validated_data['ip_address'],
+            user_agent=validated_data['user_agent'],
+            metadata_json=validated_data['metadata']
+        )
+        
+        self.created = MetadataRecord.objects.insert_if_absent(record)
+        return record
 
 class MetadataExportSerializer(serializers.Serializer):
     """Serializer for metadata export requests"""
@@ -137,11 +222,11 @@ class MetadataExportSerializer(serializers.Serializer):
     start_date = serializers.DateField(help_text="Start date for export period")
     end_date = serializers.DateField(help_text="End date for export period")
     content_types = serializers.ListField(
-        child=serializers.ChoiceField(choices=MetadataRecord.CONTENT_TYPES),
+        child=FastChoiceField(choices=MetadataRecord.CONTENT_TYPES),
         required=False,
         help_text="Content types to include in export"
     )
-    format = serializers.ChoiceField(
+    format = FastChoiceField(
         choices=['json', 'csv', 'xml'],
         default='json',
         help_text="Export format"
@@ -1,33 +1,136 @@
 import hashlib
+import ipaddress
 import json
 import logging
+import orjson
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.http import HttpRequest
 from django.utils import timezone
-from .models import AuditLog
+from . import audit_buffer
+from .models import AuditLog, DataRetentionRule
 
 logger = logging.getLogger(__name__)
 
+# Batch size for audit log bulk inserts, shared with the background writer
+AUDIT_LOG_BATCH_SIZE = audit_buffer.BATCH_SIZE
+
+_audit_buffer_state = threading.local()
+
+# Shared worker threads for hash_many, one per core
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='metadata-hash')
+
+# Valid wallet address lengths (inclusive 26-44 characters)
+WALLET_ADDRESS_LENGTHS = range(26, 45)
+
+# Addresses rejected by the security policy check
+_BLOCKED_IPS = frozenset({'0.0.0.0', '127.0.0.1', 'localhost'})
+
+# Seconds a retrieved metadata record stays cached, see metadata_cache_key
+METADATA_CACHE_TTL = 3600
+
+# Seconds retention rules stay cached, see _get_retention_rules
+RETENTION_RULES_CACHE_TTL = 60
+
+# Metadata keys required for each content type
+_REQUIRED_FIELDS = {
+    'post': frozenset({'title', 'board_slug'}),
+    'message': frozenset({'thread_id', 'parent_id'}),
+    'board': frozenset({'name', 'description'}),
+    'user': frozenset({'username', 'display_name'}),
+    'transaction': frozenset({'tx_hash', 'amount', 'token'}),
+    'interaction': frozenset({'action', 'target_id'}),
+}
+
+class AuditLogBuffer:
+    """
+    Collect audit events and write them with a single bulk insert
+    
+    While the buffer is active on the current thread, log_audit_event
+    queues entries instead of writing them; they are flushed on exit.
+    
+    Pass raise_errors=True when the buffer runs inside a transaction whose
+    work must not commit without its audit events: a failed flush then
+    raises instead of being logged and swallowed.
+    """
+    
+    def __init__(self, batch_size: int = AUDIT_LOG_BATCH_SIZE, raise_errors: bool = False):
+        self.batch_size = batch_size
+        self.raise_errors = raise_errors
+        self.entries = []
+        self._previous = None
+    
+    def __enter__(self):
+        self._previous = getattr(_audit_buffer_state, 'buffer', None)
+        _audit_buffer_state.buffer = self
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        _audit_buffer_state.buffer = self._previous
+        if exc_type is not None and self.raise_errors:
+            # The enclosing transaction is being rolled back; don't mask
+            # the original error with a flush failure
+            self.entries = []
+            return False
+        
+        # Flush even on error so completed actions are still audited
+        self.flush()
+        return False
+    
+    def flush(self) -> int:
+        """Write all queued audit events and return how many were written"""
+        if not self.entries:
+            return 0
+        
+        batch, self.entries = self.entries, []
+        return audit_buffer.write_batch(batch, self.batch_size, self.raise_errors)
+
+def metadata_cache_key(content_hash: str) -> str:
+    """Cache key for a serialized metadata record"""
+    return f"md:{content_hash}"
+
 def get_client_ip(request: HttpRequest) -> str:
     """
     Get the client's IP address from the request
     
     Handles various proxy scenarios and returns the most likely real IP
     """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        # Get the first IP in the list (client IP)
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('HTTP_X_REAL_IP')
+    meta = request.META
+    # First entry of X-Forwarded-For is the client; split at most once
+    candidates = (
+        meta.get('HTTP_X_FORWARDED_FOR', '').split(',', 1)[0].strip(),
+        meta.get('HTTP_X_REAL_IP'),
+        meta.get('REMOTE_ADDR'),
+    )
     
-    if not ip:
-        ip = request.META.get('REMOTE_ADDR')
+    # Use the first well-formed address, defaulting to localhost
+    for ip in candidates:
+        if not ip:
+            continue
+        try:
+            ipaddress.ip_address(ip)
+        except ValueError:
+            continue
+        return ip
     
-    # Validate IP format
-    if not ip or ip == 'unknown':
-        ip = '127.0.0.1'  # Default to localhost if unknown
+    return '127.0.0.1'
+
+def request_client_ip(request: HttpRequest) -> str:
+    """
+    Get the client's IP address for a request
     
-    return ip
+    Uses the address ClientIPMiddleware resolved for the request, parsing
+    the headers here when the middleware isn't installed.
+    """
+    return getattr(request, 'client_ip', None) or get_client_ip(request)
 
 def validate_metadata(content_type: str, metadata: dict) -> bool:
     """
@@ -35,61 +138,49 @@ def validate_metadata(content_type: str, metadata: dict) -> bool:
     
     Ensures metadata follows required schema for each content type
     """
-    try:
-        # Basic validation
-        if not isinstance(metadata, dict):
-            return False
-        
-        # Content type specific validation
-        if content_type == 'post':
-            required_fields = ['title', 'board_slug']
-            return all(field in metadata for field in required_fields)
-        
-        elif content_type == 'message':
-            required_fields = ['thread_id', 'parent_id']
-            return all(field in metadata for field in required_fields)
-        
-        elif content_type == 'board':
-            required_fields = ['name', 'description']
-            return all(field in metadata for field in required_fields)
-        
-        elif content_type == 'user':
-            required_fields = ['username', 'display_name']
-            return all(field in metadata for field in required_fields)
-        
-        elif content_type == 'transaction':
-            required_fields = ['tx_hash', 'amount', 'token']
-            return all(field in metadata for field in required_fields)
-        
-        elif content_type == 'interaction':
-            required_fields = ['action', 'target_id']
-            return all(field in metadata for field in required_fields)
-        
-        # Default validation for unknown content types
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error validating metadata: {str(e)}")
+    # Basic validation
+    if not isinstance(metadata, dict):
         return False
+    
+    # Unknown content types only need to be a JSON object
+    required_fields = _REQUIRED_FIELDS.get(content_type)
+    if required_fields is None:
+        return True
+    
+    return required_fields.issubset(metadata)
 
 def log_audit_event(action: str, user_address: str, ip_address: str, 
                    details: dict, authorized_by: str, is_compliant: bool = True,
-                   policy_reference: str = None) -> AuditLog:
+                   policy_reference: str = None, flush_now: bool = False) -> AuditLog:
     """
     Log an audit event for compliance tracking
     
-    Creates an audit log entry for all system actions
+    Creates an audit log entry for all system actions. Inside an
+    AuditLogBuffer the entry is queued and written when the buffer exits;
+    otherwise it is handed to the background audit buffer unless flush_now
+    asks for a synchronous write.
     """
+    audit_log = AuditLog(
+        action=action,
+        user_address=user_address,
+        ip_address=ip_address,
+        details=details,
+        authorized_by=authorized_by,
+        is_compliant=is_compliant,
+        policy_reference=policy_reference or ''
+    )
+    
+    buffer = getattr(_audit_buffer_state, 'buffer', None)
+    if buffer is not None:
+        buffer.entries.append(audit_log)
+        return audit_log
+    
     try:
-        audit_log = AuditLog.objects.create(
-            action=action,
-            user_address=user_address,
-            ip_address=ip_address,
-            details=details,
-            authorized_by=authorized_by,
-            is_compliant=is_compliant,
-            policy_reference=policy_reference
-        )
+        if flush_now:
+            # bulk_create skips the save() signal chain of objects.create()
+            AuditLog.objects.bulk_create([audit_log])
+        else:
+            audit_buffer.enqueue(audit_log)
         
         logger.info(f"Audit event logged: {action} by {user_address[:8]}...")
         return audit_log
@@ -99,16 +190,36 @@ def log_audit_event(action: str, user_address: str, ip_address: str,
         # Return None if logging fails, but don't break the main flow
         return None
 
-def hash_content(content: str) -> str:
+def hash_content(content) -> str:
     """
     Generate SHA256 hash of content
     
-    Used for creating unique identifiers for content
+    Used for creating unique identifiers for content. Bytes are hashed
+    as-is and strings as UTF-8; other values (dicts, lists, numbers) are
+    hashed as canonical JSON with sorted keys, so equal content always
+    produces the same hash.
     """
     if not content:
         return ""
     
-    return hashlib.sha256(str(content).encode('utf-8')).hexdigest()
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        data = content
+    elif isinstance(content, str):
+        data = content.encode('utf-8')
+    else:
+        data = orjson.dumps(content, default=str, option=orjson.OPT_SORT_KEYS)
+    
+    # Content fingerprint, not a security boundary
+    return hashlib.sha256(data, usedforsecurity=False).hexdigest()
+
+def hash_many(contents) -> list:
+    """
+    Hash many pieces of content in parallel
+    
+    hashlib releases the GIL while hashing, so large batches spread
+    across cores. Returns hashes in input order.
+    """
+    return list(_HASH_POOL.map(hash_content, contents))
 
 def encrypt_metadata(metadata: dict, key_id: str = None) -> tuple:
     """
@@ -130,6 +241,33 @@ def decrypt_metadata(encrypted_data: dict, key_id: str) -> dict:
     # In production, implement proper decryption
     return encrypted_data
 
+def _retention_rules_cache_key(content_type: str) -> str:
+    return f"retention_rules:{content_type}"
+
+def _get_retention_rules(content_type: str) -> tuple:
+    """
+    Get the retention rules for a content type from the shared cache
+    
+    Saving or deleting a rule evicts the cached rules, which every worker
+    sees with a shared cache backend; changes that skip model signals
+    (queryset updates) or a per-process cache are bounded by the TTL.
+    """
+    cache_key = _retention_rules_cache_key(content_type)
+    rules = cache.get(cache_key)
+    if rules is None:
+        rules = tuple(DataRetentionRule.objects.filter(content_type=content_type))
+        cache.set(cache_key, rules, RETENTION_RULES_CACHE_TTL)
+    return rules
+
+@receiver(post_save, sender=DataRetentionRule)
+@receiver(post_delete, sender=DataRetentionRule)
+def _invalidate_retention_rules(**kwargs):
+    # A saved rule may have moved between content types, so drop them all
+    cache.delete_many([
+        _retention_rules_cache_key(content_type)
+        for content_type, _ in DataRetentionRule._meta.get_field('content_type').choices
+    ])
+
 def check_compliance_policy(content_type: str, metadata: dict) -> tuple:
     """
     Check if metadata complies with current policies
@@ -141,10 +279,7 @@ def check_compliance_policy(content_type: str, metadata: dict) -> tuple:
     
     try:
         # Check data retention policies
-        from .models import DataRetentionRule
-        retention_rules = DataRetentionRule.objects.filter(content_type=content_type)
-        
-        for rule in retention_rules:
+        for rule in _get_retention_rules(content_type):
             if rule.is_encrypted and not metadata.get('is_encrypted'):
                 violations.append(f"Content type {content_type} requires encryption")
                 policy_references.append(f"DataRetention:{rule.id}")
@@ -153,14 +288,14 @@ def check_compliance_policy(content_type: str, metadata: dict) -> tuple:
         if 'user_address' in metadata:
             # Ensure wallet addresses are properly formatted
             user_addr = metadata['user_address']
-            if len(user_addr) < 26 or len(user_addr) > 44:
+            if len(user_addr) not in WALLET_ADDRESS_LENGTHS:
                 violations.append("Invalid wallet address format")
                 policy_references.append("Privacy:WalletAddressFormat")
         
         # Check security policies
         if 'ip_address' in metadata:
             ip = metadata['ip_address']
-            if ip in ['0.0.0.0', '127.0.0.1', 'localhost']:
+            if ip in _BLOCKED_IPS:
                 violations.append("Invalid IP address")
                 policy_references.append("Security:IPAddressValidation")
         
@@ -172,70 +307,167 @@ def check_compliance_policy(content_type: str, metadata: dict) -> tuple:
         logger.error(f"Error checking compliance policy: {str(e)}")
         return False, ["Policy check failed"], []
 
-def generate_compliance_report(start_date: str, end_date: str, 
+def day_bounds(start: date, end: date) -> tuple:
+    """
+    Datetime bounds covering whole days from start to end inclusive
+    
+    Returns a half-open [start, end + 1 day) range in the current timezone,
+    which lets timestamp filters use the column index directly.
+    """
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(start, time.min, tzinfo=tz),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+    )
+
+def _count_by(queryset, field: str) -> dict:
+    """Count rows grouped by a field, returned as {value: count}"""
+    return dict(queryset.order_by().values(field).annotate(count=Count('id')).values_list(field, 'count'))
+
+_COMPLIANCE_SUMMARY_SQL = """
+WITH md AS (
+    SELECT content_type, user_address FROM {metadata_table}
+    WHERE timestamp >= %s AND timestamp < %s {content_type_filter}
+), au AS (
+    SELECT is_compliant FROM {audit_table}
+    WHERE timestamp >= %s AND timestamp < %s
+), pol AS (
+    SELECT policy_type FROM {policy_table}
+    WHERE is_active
+)
+SELECT jsonb_build_object(
+    'metadata_summary', jsonb_build_object(
+        'total_records', (SELECT COUNT(*) FROM md),
+        'content_types', (
+            SELECT COALESCE(jsonb_object_agg(content_type, n), '{{}}'::jsonb)
+            FROM (SELECT content_type, COUNT(*) AS n FROM md GROUP BY content_type) s
+        ),
+        'unique_users', (SELECT COUNT(DISTINCT user_address) FROM md)
+    ),
+    'audit_summary', (
+        SELECT jsonb_build_object(
+            'total_actions', COUNT(*),
+            'compliant_actions', COUNT(*) FILTER (WHERE is_compliant),
+            'violations', COUNT(*) FILTER (WHERE NOT is_compliant),
+            'compliance_rate', CASE WHEN COUNT(*) > 0
+                THEN ROUND(100.0 * COUNT(*) FILTER (WHERE is_compliant) / COUNT(*), 2)
+                ELSE 100 END
+        )
+        FROM au
+    ),
+    'policy_summary', jsonb_build_object(
+        'active_policies', (SELECT COUNT(*) FROM pol),
+        'policy_types', (
+            SELECT COALESCE(jsonb_object_agg(policy_type, n), '{{}}'::jsonb)
+            FROM (SELECT policy_type, COUNT(*) AS n FROM pol GROUP BY policy_type) s
+        )
+    )
+)
+"""
+
+def _compliance_summary_sql(start_dt: datetime, end_dt: datetime, content_types: list = None) -> dict:
+    """
+    Build the report summaries in Postgres with a single query
+    
+    The database assembles the whole summary as one JSONB value.
+    """
+    from .models import MetadataRecord, CompliancePolicy
+    
+    params = [start_dt, end_dt]
+    content_type_filter = ''
+    if content_types:
+        content_type_filter = 'AND content_type = ANY(%s)'
+        params.append(list(content_types))
+    params += [start_dt, end_dt]
+    
+    sql = _COMPLIANCE_SUMMARY_SQL.format(
+        metadata_table=MetadataRecord._meta.db_table,
+        audit_table=AuditLog._meta.db_table,
+        policy_table=CompliancePolicy._meta.db_table,
+        content_type_filter=content_type_filter
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        summary = cursor.fetchone()[0]
+    
+    # Django has psycopg2 hand jsonb back undecoded, as a string
+    return orjson.loads(summary) if isinstance(summary, (str, bytes)) else summary
+
+def _compliance_summary_orm(start_dt: datetime, end_dt: datetime, content_types: list = None) -> dict:
+    """Build the report summaries with ORM aggregates (non-Postgres backends)"""
+    from .models import MetadataRecord, CompliancePolicy
+    
+    # Get metadata records for the period
+    metadata_records = MetadataRecord.objects.filter(timestamp__gte=start_dt, timestamp__lt=end_dt)
+    
+    if content_types:
+        metadata_records = metadata_records.filter(content_type__in=content_types)
+    
+    metadata_totals = metadata_records.aggregate(
+        total=Count('id'),
+        users=Count('user_address', distinct=True)
+    )
+    
+    # Get audit logs for the period
+    audit_logs = AuditLog.objects.filter(timestamp__gte=start_dt, timestamp__lt=end_dt)
+    
+    # Get active policies
+    active_policies = CompliancePolicy.objects.filter(is_active=True)
+    
+    # Calculate compliance metrics in a single scan
+    audit_totals = audit_logs.aggregate(
+        total=Count('id'),
+        compliant=Count('id', filter=Q(is_compliant=True)),
+        violations=Count('id', filter=Q(is_compliant=False))
+    )
+    total_actions = audit_totals['total']
+    compliant_actions = audit_totals['compliant']
+    compliance_rate = (compliant_actions / total_actions * 100) if total_actions > 0 else 100
+    
+    return {
+        'metadata_summary': {
+            'total_records': metadata_totals['total'],
+            'content_types': _count_by(metadata_records, 'content_type'),
+            'unique_users': metadata_totals['users']
+        },
+        'audit_summary': {
+            'total_actions': total_actions,
+            'compliant_actions': compliant_actions,
+            'violations': audit_totals['violations'],
+            'compliance_rate': round(compliance_rate, 2)
+        },
+        'policy_summary': {
+            'active_policies': active_policies.count(),
+            'policy_types': _count_by(active_policies, 'policy_type')
+        }
+    }
+
+def generate_compliance_report(start_date: date, end_date: date, 
                              content_types: list = None) -> dict:
     """
     Generate a compliance report for the specified period
     
+    Dates are normally already-validated date objects (e.g. from
+    MetadataExportSerializer); ISO 'YYYY-MM-DD' strings are also accepted.
     Returns comprehensive compliance data
     """
     try:
-        from .models import MetadataRecord, AuditLog, CompliancePolicy
-        
-        # Convert string dates to date objects
-        start = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
-        end = timezone.datetime.strptime(end_date, '%Y-%m-%d').date()
-        
-        # Get metadata records for the period
-        metadata_query = MetadataRecord.objects.filter(
-            timestamp__date__range=[start, end]
-        )
-        
-        if content_types:
-            metadata_query = metadata_query.filter(content_type__in=content_types)
-        
-        metadata_records = metadata_query
-        total_records = metadata_records.count()
-        
-        # Get audit logs for the period
-        audit_logs = AuditLog.objects.filter(timestamp__date__range=[start, end])
+        start = date.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+        end = date.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+        start_dt, end_dt = day_bounds(start, end)
         
-        # Get policy violations
-        violations = audit_logs.filter(is_compliant=False)
-        
-        # Get active policies
-        active_policies = CompliancePolicy.objects.filter(is_active=True)
-        
-        # Calculate compliance metrics
-        total_actions = audit_logs.count()
-        compliant_actions = audit_logs.filter(is_compliant=True).count()
-        compliance_rate = (compliant_actions / total_actions * 100) if total_actions > 0 else 100
+        if connection.vendor == 'postgresql':
+            summary = _compliance_summary_sql(start_dt, end_dt, content_types)
+        else:
+            summary = _compliance_summary_orm(start_dt, end_dt, content_types)
         
         # Generate report
         report = {
             'period': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'metadata_summary': {
-                'total_records': total_records,
-                'content_types': list(metadata_records.values('content_type').annotate(
-                    count=models.Count('id')
-                )),
-                'unique_users': metadata_records.values('user_address').distinct().count()
-            },
-            'audit_summary': {
-                'total_actions': total_actions,
-                'compliant_actions': compliant_actions,
-                'violations': violations.count(),
-                'compliance_rate': round(compliance_rate, 2)
-            },
-            'policy_summary': {
-                'active_policies': active_policies.count(),
-                'policy_types': list(active_policies.values('policy_type').annotate(
-                    count=models.Count('id')
-                ))
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat()
             },
+            **summary,
             'generated_at': timezone.now().isoformat()
         }
         
@@ -248,69 +480,111 @@ def generate_compliance_report(start_date: str, end_date: str,
             'details': str(e)
         }
 
+# Expired records deleted per statement (and per transaction) by cleanup_expired_metadata
+CLEANUP_BATCH_SIZE = 10000
+
+def _delete_expired_batch(now: datetime, cleanup_summary: dict) -> int:
+    """
+    Delete up to CLEANUP_BATCH_SIZE expired records in one transaction
+    
+    The batch's audit events commit with its deletes, and cached copies of
+    the deleted records are evicted once it commits. Returns the number of
+    records deleted.
+    """
+    from .models import DataRetentionRule, MetadataRecord
+    from django.utils import timezone
+    
+    # Audit events are queued and written in one bulk insert before the
+    # commit, and a failed insert rolls the batch's deletes back
+    with transaction.atomic(), AuditLogBuffer(raise_errors=True):
+        # Lock the rules so concurrent cleanup workers skip rather than
+        # double-process them
+        retention_rules = {
+            rule.content_type: rule
+            for rule in DataRetentionRule.objects.select_for_update(skip_locked=True)
+        }
+        if not retention_rules:
+            return 0
+        
+        predicates = []
+        params = []
+        for rule in retention_rules.values():
+            predicates.append("(content_type = %s AND timestamp < %s)")
+            params += [rule.content_type, now - timezone.timedelta(days=rule.retention_period_days)]
+        
+        # Delete a bounded batch of expired records for every rule in one
+        # statement; RETURNING gives the per-content-type counts
+        table = MetadataRecord._meta.db_table
+        pk = MetadataRecord._meta.pk.column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {pk} IN ("
+                f"SELECT {pk} FROM {table} WHERE {' OR '.join(predicates)} LIMIT %s"
+                f") RETURNING content_type, content_hash",
+                params + [CLEANUP_BATCH_SIZE]
+            )
+            deleted_rows = cursor.fetchall()
+        
+        deleted = Counter(content_type for content_type, _ in deleted_rows)
+        
+        # Drop cached copies of deleted records once the batch commits
+        deleted_keys = [metadata_cache_key(content_hash) for _, content_hash in deleted_rows]
+        if deleted_keys:
+            transaction.on_commit(lambda: cache.delete_many(deleted_keys))
+        
+        for content_type, count in deleted.items():
+            rule = retention_rules[content_type]
+            
+            # Log cleanup action
+            log_audit_event(
+                action='delete',
+                user_address='system',
+                ip_address='127.0.0.1',
+                details={
+                    'content_type': content_type,
+                    'records_deleted': count,
+                    'retention_policy': rule.id
+                },
+                authorized_by='system',
+                is_compliant=True,
+                policy_reference=f"DataRetention:{rule.id}"
+            )
+    
+    # Count the batch only once it has committed
+    cleanup_summary['records_processed'] += len(deleted_rows)
+    cleanup_summary['records_deleted'] += len(deleted_rows)
+    return len(deleted_rows)
+
 def cleanup_expired_metadata() -> dict:
     """
     Clean up expired metadata based on retention policies
     
+    Records are deleted in batches of CLEANUP_BATCH_SIZE, each in its own
+    transaction, so a large purge never holds one long transaction or
+    loads every deleted hash at once.
     Returns cleanup summary
     """
+    from django.utils import timezone
+    
+    cleanup_summary = {
+        'records_processed': 0,
+        'records_deleted': 0,
+        'errors': []
+    }
+    
     try:
-        from .models import DataRetentionRule, MetadataRecord
-        from django.utils import timezone
-        
-        cleanup_summary = {
-            'records_processed': 0,
-            'records_deleted': 0,
-            'errors': []
-        }
-        
-        # Get all retention rules
-        retention_rules = DataRetentionRule.objects.all()
-        
-        for rule in retention_rules:
-            try:
-                # Calculate cutoff date
-                cutoff_date = timezone.now() - timezone.timedelta(days=rule.retention_period_days)
-                
-                # Find expired records
-                expired_records = MetadataRecord.objects.filter(
-                    content_type=rule.content_type,
-                    timestamp__lt=cutoff_date
-                )
-                
-                count = expired_records.count()
-                cleanup_summary['records_processed'] += count
-                
-                # Delete expired records
-                if count > 0:
-                    expired_records.delete()
-                    cleanup_summary['records_deleted'] += count
-                    
-                    # Log cleanup action
-                    log_audit_event(
-                        action='delete',
-                        user_address='system',
-                        ip_address='127.0.0.1',
-                        details={
-                            'content_type': rule.content_type,
-                            'records_deleted': count,
-                            'retention_policy': rule.id
-                        },
-                        authorized_by='system',
-                        is_compliant=True,
-                        policy_reference=f"DataRetention:{rule.id}"
-                    )
-                
-            except Exception as e:
-                error_msg = f"Error processing rule {rule.id}: {str(e)}"
-                cleanup_summary['errors'].append(error_msg)
-                logger.error(error_msg)
+        # Cutoffs are fixed at the start so the run has a definite end
+        now = timezone.now()
+        while _delete_expired_batch(now, cleanup_summary) == CLEANUP_BATCH_SIZE:
+            pass
         
         return cleanup_summary
         
     except Exception as e:
         logger.error(f"Error in cleanup_expired_metadata: {str(e)}")
+        # Batches before the failure are committed; report what they deleted
         return {
             'error': 'Cleanup failed',
-            'details': str(e)
+            'details': str(e),
+            'records_deleted': cleanup_summary['records_deleted']
         }
@@ -1,31 +1,82 @@
 from django.shortcuts import render
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.decorators import (
+    api_view, parser_classes, permission_classes, renderer_classes, throttle_classes
+)
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle
+from rest_framework.throttling import BaseThrottle
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Count, Window
+import csv
 import json
-import hashlib
 import logging
+import orjson
+import time
+from datetime import date
 from django.utils import timezone
 
 from .models import MetadataRecord, AuditLog, CompliancePolicy, DataRetentionRule
-from .serializers import MetadataRecordSerializer, AuditLogSerializer
-from .utils import get_client_ip, validate_metadata, log_audit_event
+from .serializers import (
+    MetadataCreateSerializer, MetadataRecordSerializer, MetadataRecordListSerializer, AuditLogSerializer,
+    mask_sensitive
+)
+from .utils import (
+    METADATA_CACHE_TTL, day_bounds, log_audit_event, request_client_ip,
+    metadata_cache_key
+)
+from .exceptions import handle_api_errors
+from .renderers import API_PARSER_CLASSES, API_RENDERER_CLASSES, orjson_dumps
 
 logger = logging.getLogger(__name__)
 
-class MetadataRateThrottle(UserRateThrottle):
-    rate = '100/hour'  # Limit to 100 requests per hour per user
+class MetadataRateThrottle(BaseThrottle):
+    """
+    Limit each user to 100 requests per hour
+    
+    Counts requests in fixed hourly buckets with one atomic cache increment,
+    instead of UserRateThrottle's read-modify-write of a timestamp history.
+    """
+    
+    num_requests = 100
+    duration = 3600
+    
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f"throttle:md:{ident}:{int(self.now // self.duration)}"
+    
+    def allow_request(self, request, view):
+        self.now = time.time()
+        key = self.get_cache_key(request)
+        
+        # add() starts the bucket (with its expiry) only if it doesn't exist
+        if cache.add(key, 1, self.duration):
+            return True
+        try:
+            count = cache.incr(key)
+        except ValueError:  # bucket expired between add() and incr()
+            cache.add(key, 1, self.duration)
+            count = 1
+        return count <= self.num_requests
+    
+    def wait(self):
+        return self.duration - (self.now % self.duration)
 
 @api_view(['POST'])
+@renderer_classes(API_RENDERER_CLASSES)
+@parser_classes(API_PARSER_CLASSES)
 @permission_classes([IsAuthenticated])
 @throttle_classes([MetadataRateThrottle])
+@handle_api_errors
 def store_metadata(request):
     """
     Store metadata for compliance purposes
@@ -33,72 +84,53 @@ def store_metadata(request):
     This endpoint stores metadata about user interactions for policy compliance.
     All metadata is logged and can be accessed by authorized entities.
     """
-    try:
-        # Extract data from request
-        data = request.data
-        user_address = data.get('user_address')
-        content_type = data.get('content_type')
-        content = data.get('content')
-        additional_metadata = data.get('metadata', {})
-        
-        # Validate required fields
-        if not all([user_address, content_type, content]):
-            return Response({
-                'error': 'Missing required fields: user_address, content_type, content'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Generate content hash
-        content_hash = hashlib.sha256(str(content).encode()).hexdigest()
-        
-        # Get client IP and user agent
-        ip_address = get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
-        # Validate metadata
-        if not validate_metadata(content_type, additional_metadata):
-            return Response({
-                'error': 'Invalid metadata format'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create metadata record
-        metadata_record = MetadataRecord.objects.create(
-            content_hash=content_hash,
-            content_type=content_type,
-            user_address=user_address,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            metadata_json=additional_metadata
-        )
-        
-        # Log audit event
-        log_audit_event(
-            action='create',
-            user_address=user_address,
-            ip_address=ip_address,
-            details={
-                'content_type': content_type,
-                'content_hash': content_hash,
-                'metadata_id': metadata_record.id
-            },
-            authorized_by='system'
-        )
-        
+    # Parse and validate the request in one pass
+    serializer = MetadataCreateSerializer(data=request.data)
+    if not serializer.is_valid():
         return Response({
-            'success': True,
-            'metadata_id': metadata_record.id,
-            'content_hash': content_hash,
-            'message': 'Metadata stored successfully'
-        }, status=status.HTTP_201_CREATED)
-        
-    except Exception as e:
-        logger.error(f"Error storing metadata: {str(e)}")
-        return Response({
-            'error': 'Internal server error',
-            'details': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'Invalid metadata',
+            'details': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Get client IP and user agent
+    ip_address = request_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    
+    # Create metadata record; content that is already stored is a no-op
+    metadata_record = serializer.save(ip_address=ip_address, user_agent=user_agent)
+    created = serializer.created
+    user_address = metadata_record.user_address
+    content_type = metadata_record.content_type
+    content_hash = metadata_record.content_hash
+    
+    # Log audit event; a resubmission is flagged as a duplicate so the
+    # submitter isn't recorded as the record's creator
+    details = {
+        'content_type': content_type,
+        'content_hash': content_hash,
+        'metadata_id': metadata_record.id
+    }
+    if not created:
+        details['duplicate'] = True
+    log_audit_event(
+        action='create',
+        user_address=user_address,
+        ip_address=ip_address,
+        details=details,
+        authorized_by='system'
+    )
+    
+    return Response({
+        'success': True,
+        'metadata_id': metadata_record.id,
+        'content_hash': content_hash,
+        'message': 'Metadata stored successfully' if created else 'Metadata already stored'
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 @api_view(['GET'])
+@renderer_classes(API_RENDERER_CLASSES)
 @permission_classes([IsAuthenticated])
+@handle_api_errors
 def retrieve_metadata(request, content_hash):
     """
     Retrieve metadata for authorized access
@@ -106,88 +138,154 @@ def retrieve_metadata(request, content_hash):
     This endpoint allows authorized entities to retrieve metadata
     for compliance and policy enforcement purposes.
     """
-    try:
-        # Check if metadata exists
-        try:
-            metadata_record = MetadataRecord.objects.get(content_hash=content_hash)
-        except MetadataRecord.DoesNotExist:
-            return Response({
-                'error': 'Metadata not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Log access for audit trail
-        log_audit_event(
-            action='read',
-            user_address=request.user.username if hasattr(request.user, 'username') else 'unknown',
-            ip_address=get_client_ip(request),
-            details={
-                'content_hash': content_hash,
-                'metadata_id': metadata_record.id
-            },
-            authorized_by='authenticated_user'
-        )
-        
-        # Serialize and return metadata
-        serializer = MetadataRecordSerializer(metadata_record)
-        return Response(serializer.data)
+    # Records are immutable per content hash, so serve repeat reads from cache
+    cache_key = metadata_cache_key(content_hash)
+    data = cache.get(cache_key)
+    
+    if data is None:
+        # A missing record raises DoesNotExist, which handle_api_errors
+        # turns into the 404 response
+        metadata_record = MetadataRecord.objects.get(content_hash=content_hash)
         
-    except Exception as e:
-        logger.error(f"Error retrieving metadata: {str(e)}")
-        return Response({
-            'error': 'Internal server error',
-            'details': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Serialize metadata
+        data = MetadataRecordSerializer(metadata_record).data
+        cache.set(cache_key, data, METADATA_CACHE_TTL)
+    
+    # Log access for audit trail
+    log_audit_event(
+        action='read',
+        user_address=getattr(request.user, 'username', 'unknown'),
+        ip_address=request_client_ip(request),
+        details={
+            'content_hash': content_hash,
+            'metadata_id': data['id']
+        },
+        authorized_by='authenticated_user'
+    )
+    
+    return Response(data)
 
 @api_view(['GET'])
+@renderer_classes(API_RENDERER_CLASSES)
 @permission_classes([IsAdminUser])
+@handle_api_errors
 def list_metadata(request):
     """
     List metadata records for administrative purposes
     
     This endpoint is restricted to admin users and provides
-    a paginated list of metadata records.
+    a paginated list of metadata records. Pass ``cursor`` (empty for the
+    first page, then the returned ``next_cursor``) for keyset pagination,
+    which skips the total count. Filter by ``user_address`` (substring,
+    at least 3 characters) or ``user_address_exact`` (full address).
     """
-    try:
-        # Get query parameters
-        page = int(request.GET.get('page', 1))
-        page_size = min(int(request.GET.get('page_size', 50)), 100)  # Max 100 per page
-        content_type = request.GET.get('content_type')
-        user_address = request.GET.get('user_address')
-        
-        # Build query
-        queryset = MetadataRecord.objects.all()
-        
-        if content_type:
-            queryset = queryset.filter(content_type=content_type)
-        if user_address:
-            queryset = queryset.filter(user_address__icontains=user_address)
-        
-        # Paginate results
-        start = (page - 1) * page_size
-        end = start + page_size
-        metadata_records = queryset[start:end]
+    # Get query parameters
+    page = int(request.GET.get('page', 1))
+    page_size = min(int(request.GET.get('page_size', 50)), 100)  # Max 100 per page
+    cursor = request.GET.get('cursor')
+    content_type = request.GET.get('content_type')
+    user_address = request.GET.get('user_address')
+    user_address_exact = request.GET.get('user_address_exact')
+    
+    # Substring search is served by a trigram index, which needs 3+ characters
+    if user_address and len(user_address) < 3:
+        return Response({
+            'error': 'user_address search requires at least 3 characters'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Build query
+    queryset = MetadataRecord.objects.list_fields()
+    
+    if content_type:
+        queryset = queryset.filter(content_type=content_type)
+    if user_address_exact:
+        queryset = queryset.filter(user_address=user_address_exact)
+    if user_address:
+        queryset = queryset.filter(user_address__icontains=user_address)
+    
+    if cursor is not None:
+        # Keyset pagination: walk the id index from the last id seen,
+        # without counting or skipping rows
+        if cursor:
+            try:
+                last_id = int(cursor)
+            except ValueError:
+                return Response({
+                    'error': 'Invalid cursor'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(id__lt=last_id)
+        metadata_records = list(queryset.order_by('-id')[:page_size + 1])
+        has_next = len(metadata_records) > page_size
+        metadata_records = metadata_records[:page_size]
         
-        # Serialize results
-        serializer = MetadataRecordSerializer(metadata_records, many=True)
+        serializer = MetadataRecordListSerializer(metadata_records, many=True)
         
         return Response({
             'results': serializer.data,
-            'page': page,
             'page_size': page_size,
-            'total_count': queryset.count(),
-            'has_next': end < queryset.count(),
-            'has_previous': page > 1
+            'next_cursor': metadata_records[-1].id if has_next else None,
+            'has_next': has_next
         })
-        
-    except Exception as e:
-        logger.error(f"Error listing metadata: {str(e)}")
-        return Response({
-            'error': 'Internal server error',
-            'details': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    # Paginate results, counting the full result set in the same query
+    start = (page - 1) * page_size
+    end = start + page_size
+    metadata_records = list(
+        queryset.annotate(full_count=Window(expression=Count('*'))).order_by('-timestamp')[start:end]
+    )
+    if metadata_records:
+        total_count = metadata_records[0].full_count
+    else:
+        # Past the last page the window has no rows to report the total on
+        total_count = queryset.count() if start else 0
+    
+    # Serialize results
+    serializer = MetadataRecordListSerializer(metadata_records, many=True)
+    
+    return Response({
+        'results': serializer.data,
+        'page': page,
+        'page_size': page_size,
+        'total_count': total_count,
+        'has_next': end < total_count,
+        'has_previous': page > 1
+    })
+
+# Columns included in metadata exports
+EXPORT_FIELDS = MetadataRecordSerializer.Meta.fields
+
+# Rows fetched per round trip while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+def _stream_json_export(rows, export_info):
+    """Yield an export as JSON, one record at a time"""
+    yield b'{"success":true,"metadata":' + orjson_dumps(export_info) + b',"export_data":['
+    for index, row in enumerate(rows):
+        if index:
+            yield b','
+        yield orjson_dumps(mask_sensitive(row))
+    yield b']}'
+
+def _stream_csv_export(rows):
+    """Yield an export as CSV, one record at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row = mask_sensitive(row)
+        row['metadata_json'] = orjson.dumps(row['metadata_json']).decode()
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
 
 @api_view(['POST'])
+@renderer_classes(API_RENDERER_CLASSES)
+@parser_classes(API_PARSER_CLASSES)
 @permission_classes([IsAdminUser])
+@handle_api_errors
 def export_metadata(request):
     """
     Export metadata for compliance reporting
@@ -195,122 +293,177 @@ def export_metadata(request):
     This endpoint allows administrators to export metadata
     for regulatory compliance and audit purposes.
     """
-    try:
-        # Get export parameters
-        start_date = request.data.get('start_date')
-        end_date = request.data.get('end_date')
-        content_types = request.data.get('content_types', [])
-        format_type = request.data.get('format', 'json')
-        
-        # Validate dates
-        if not start_date or not end_date:
-            return Response({
-                'error': 'Start date and end date are required'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Build query
-        queryset = MetadataRecord.objects.filter(
-            timestamp__date__range=[start_date, end_date]
-        )
-        
-        if content_types:
-            queryset = queryset.filter(content_type__in=content_types)
-        
-        # Serialize data
-        serializer = MetadataRecordSerializer(queryset, many=True)
-        
-        # Log export for audit trail
-        log_audit_event(
-            action='export',
-            user_address=request.user.username if hasattr(request.user, 'username') else 'unknown',
-            ip_address=get_client_ip(request),
-            details={
-                'start_date': start_date,
-                'end_date': end_date,
-                'content_types': content_types,
-                'format': format_type,
-                'record_count': queryset.count()
-            },
-            authorized_by='admin_user'
-        )
-        
+    # Get export parameters
+    start_date = request.data.get('start_date')
+    end_date = request.data.get('end_date')
+    content_types = request.data.get('content_types', [])
+    format_type = request.data.get('format', 'json')
+    
+    # Validate dates
+    if not start_date or not end_date:
         return Response({
-            'success': True,
-            'export_data': serializer.data,
-            'metadata': {
-                'start_date': start_date,
-                'end_date': end_date,
-                'content_types': content_types,
-                'format': format_type,
-                'record_count': queryset.count(),
-                'exported_at': timezone.now().isoformat()
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error exporting metadata: {str(e)}")
+            'error': 'Start date and end date are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start_dt, end_dt = day_bounds(date.fromisoformat(start_date), date.fromisoformat(end_date))
+    except (TypeError, ValueError):
         return Response({
-            'error': 'Internal server error',
-            'details': str(e)}
-        , status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'Dates must be in YYYY-MM-DD format'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Build query; a half-open timestamp range can use the timestamp
+    # index, unlike filtering on the timestamp's date
+    queryset = MetadataRecord.objects.filter(
+        timestamp__gte=start_dt,
+        timestamp__lt=end_dt
+    )
+    
+    if content_types:
+        queryset = queryset.filter(content_type__in=content_types)
+    
+    record_count = queryset.count()
+    
+    # Log export for audit trail
+    log_audit_event(
+        action='export',
+        user_address=getattr(request.user, 'username', 'unknown'),
+        ip_address=request_client_ip(request),
+        details={
+            'start_date': start_date,
+            'end_date': end_date,
+            'content_types': content_types,
+            'format': format_type,
+            'record_count': record_count
+        },
+        authorized_by='admin_user',
+        flush_now=True
+    )
+    
+    # Stream rows from the database in chunks instead of building the
+    # whole export in memory. On PostgreSQL iterator() reads through a
+    # named (server-side) cursor, so only one chunk is held at a time.
+    rows = queryset.order_by('-timestamp').values(*EXPORT_FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    
+    if format_type == 'csv':
+        response = StreamingHttpResponse(_stream_csv_export(rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="metadata_export.csv"'
+        return response
+    
+    export_info = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'content_types': content_types,
+        'format': format_type,
+        'record_count': record_count,
+        'exported_at': timezone.now()
+    }
+    return StreamingHttpResponse(
+        _stream_json_export(rows, export_info),
+        content_type='application/json'
+    )
+
+# Maximum audit entries fetched (and violations returned) by compliance_status
+COMPLIANCE_STATUS_WINDOW = 50
+
+# Audit columns in compliance_status responses, as AuditLogSerializer renders them
+AUDIT_STATUS_FIELDS = AuditLogSerializer.Meta.fields
 
 @api_view(['GET'])
+@renderer_classes(API_RENDERER_CLASSES)
 @permission_classes([IsAuthenticated])
+@handle_api_errors
 def compliance_status(request):
     """
     Get compliance status for the system
     
     This endpoint provides information about current compliance
-    status and any policy violations.
+    status and up to COMPLIANCE_STATUS_WINDOW recent policy violations.
     """
-    try:
-        # Get recent audit logs
-        recent_audits = AuditLog.objects.filter(
-            timestamp__gte=timezone.now() - timezone.timedelta(days=7)
-        )
-        
-        # Check for policy violations
-        violations = recent_audits.filter(is_compliant=False)
-        
-        # Get active policies
-        active_policies = CompliancePolicy.objects.filter(is_active=True)
-        
-        return Response({
-            'compliance_status': 'compliant' if not violations.exists() else 'violations_detected',
-            'recent_audits': AuditLogSerializer(recent_audits[:10], many=True).data,
-            'policy_violations': AuditLogSerializer(violations, many=True).data,
-            'active_policies': active_policies.count(),
-            'last_updated': timezone.now().isoformat()
-        })
-        
-    except Exception as e:
-        logger.error(f"Error getting compliance status: {str(e)}")
-        return Response({
-            'error': 'Internal server error',
-            'details': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # Get recent audit logs in one bounded query, as plain dicts; this
+    # read-only view has no per-field logic needing a serializer
+    recent_audits = AuditLog.objects.filter(
+        timestamp__gte=timezone.now() - timezone.timedelta(days=7)
+    ).order_by('-timestamp').values(*AUDIT_STATUS_FIELDS)
+    recent = [mask_sensitive(row) for row in recent_audits[:COMPLIANCE_STATUS_WINDOW]]
+    
+    # Check for policy violations; if the window is full, older entries in
+    # the period may hold more, so fetch those separately (still bounded)
+    if len(recent) < COMPLIANCE_STATUS_WINDOW:
+        violations = [audit for audit in recent if not audit['is_compliant']]
+    else:
+        violations = [
+            mask_sensitive(row)
+            for row in recent_audits.filter(is_compliant=False)[:COMPLIANCE_STATUS_WINDOW]
+        ]
+    
+    # Get active policies
+    active_policies = CompliancePolicy.objects.filter(is_active=True).count()
+    
+    return Response({
+        'compliance_status': 'compliant' if not violations else 'violations_detected',
+        'recent_audits': recent[:10],
+        'policy_violations': violations,
+        'active_policies': active_policies,
+        'last_updated': timezone.now()
+    })
+
+# Seconds to reuse row counts between health checks
+HEALTH_COUNT_TTL = 30
+
+def _table_row_counts():
+    """
+    Approximate row counts for the metadata and audit tables
+    
+    Postgres answers from the planner's pg_class estimates without scanning
+    the tables; other backends reuse a cached exact count for HEALTH_COUNT_TTL.
+    """
+    if connection.vendor == 'postgresql':
+        tables = [MetadataRecord._meta.db_table, AuditLog._meta.db_table]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class "
+                "WHERE oid IN (%s::regclass, %s::regclass)",
+                tables
+            )
+            estimates = dict(cursor.fetchall())
+        # reltuples is -1 until the table has been analyzed
+        return tuple(max(estimates.get(table, 0), 0) for table in tables)
+    
+    return (
+        cache.get_or_set('health:metadata_count', MetadataRecord.objects.count, HEALTH_COUNT_TTL),
+        cache.get_or_set('health:audit_count', AuditLog.objects.count, HEALTH_COUNT_TTL)
+    )
 
 # Health check endpoint
 @api_view(['GET'])
+@renderer_classes(API_RENDERER_CLASSES)
 def health_check(request):
     """
     Health check endpoint for monitoring
+    
+    Row counts are estimates; pass ?exact=1 for exact (full scan) counts.
     """
     try:
         # Check database connectivity
-        metadata_count = MetadataRecord.objects.count()
-        audit_count = AuditLog.objects.count()
+        if request.GET.get('exact') == '1':
+            metadata_count = MetadataRecord.objects.count()
+            audit_count = AuditLog.objects.count()
+        else:
+            metadata_count, audit_count = _table_row_counts()
         
         return Response({
             'status': 'healthy',
             'database': 'connected',
             'metadata_records': metadata_count,
             'audit_logs': audit_count,
-            'timestamp': timezone.now().isoformat()
+            'timestamp': timezone.now()
         })
     except Exception as e:
         return Response({
             'status': 'unhealthy',
             'error': str(e),
-            'timestamp': timezone.now().isoformat()
+            'timestamp': timezone.now()
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)